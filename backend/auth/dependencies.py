@@ -1,29 +1,37 @@
 # auth/dependencies.py
 from fastapi import Header, HTTPException, Query
 from typing import Dict, Any
+from cachetools import TTLCache
 from services.challenge_auth_service import challenge_auth_service
 from database import mongodb
 
+# Users of recently validated session tokens. Kept well below SESSION_LIFETIME_SECONDS, so a
+# cached token outlives its session by at most a minute
+_user_cache = TTLCache(maxsize=10_000, ttl=60)
+
 
 async def get_current_user(token: str = Query(..., alias="session-token")):
     """
     This dependency validates the session token and gets the associated user.
     It can be used in other route handlers that require authentication.
     """
-    is_valid = await challenge_auth_service.is_session_valid(token)
-    if not is_valid:
-        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    user = _user_cache.get(token)
+    if user is not None:
+        return user
 
-    # Get the public key from the session
+    # Only unexpired, verified sessions have a public key, so this one lookup also validates the token
     public_key = await challenge_auth_service.get_public_key_for_session(token)
     if not public_key:
-        raise HTTPException(status_code=401, detail="Invalid session")
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
 
     # Fetch the user from the database using the public key
     from database import mongodb
-    user = await mongodb.db.users.find_one({"nostr_public_key": public_key})
+    # Route handlers never need the stored key seed, so leave it in the database
+    user = await mongodb.db.users.find_one({"nostr_public_key": public_key}, {"raw_seed": 0})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
+    _user_cache[token] = user
+
     # Return user data for use in protected routes
     return user
\ No newline at end of file
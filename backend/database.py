@@ -2,6 +2,7 @@ from motor.motor_asyncio import AsyncIOMotorClient
 import os
 from dotenv import load_dotenv
 from typing import Optional
+from pymongo.errors import OperationFailure
 
 # Load environment variables
 load_dotenv()
@@ -33,6 +34,29 @@ class MongoDB:
         print("Connected to MongoDB!")
         return self.db
 
+    async def _create_unique_index(self, collection, keys):
+        """Create a unique index, but keep the app running if existing documents already break it"""
+        try:
+            await collection.create_index(keys, unique=True)
+        except OperationFailure as e:
+            if e.code != 11000:
+                raise
+            print(f"Could not create unique index {keys} on {collection.name}: duplicates exist ({e})")
+
+    async def create_indexes(self):
+        # Logins upsert users by public key, so it has to be unique
+        await self._create_unique_index(self.db.users, "nostr_public_key")
+        # TTL index: MongoDB deletes sessions on its own once expires_at has passed
+        await self.db.sessions.create_index("expires_at", expireAfterSeconds=0)
+        await self._create_unique_index(self.db.sessions, "session_id")
+        # Listings are looked up by seller and by buyer
+        await self.db.listings.create_index("pubkey")
+        await self.db.listings.create_index("paid_by")
+        # One review per transaction; seller pages filter on verified reviews
+        await self._create_unique_index(self.db.reviews, "transaction_id")
+        await self.db.reviews.create_index([("seller_pubkey", 1), ("verified", 1)])
+        print("MongoDB indexes ensured")
+
     def close_mongo_connection(self):
         if self.client:
             self.client.close()
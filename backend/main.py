@@ -1,14 +1,22 @@
 import json
+import os
 from contextlib import asynccontextmanager
+
+import anyio
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import FastAPI, Request
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
+from slowapi import _rate_limit_exceeded_handler
+from slowapi.errors import RateLimitExceeded
 from starlette.types import Message
 
 from routers import invoices
 from database import mongodb
+from rate_limit import limiter
 from routers import listings, users, auth, reviews
+from services.bulk_writer import close_bulk_writers
+from services.keygen import keygen_pool
 from services.nostr_service import nostr_service
 from services.user_service import user_service
 
@@ -19,6 +27,11 @@ async def lifespan(app: FastAPI):
     # Startup: Connect to the database and Nostr
     mongodb.connect_to_mongo()
     print("Connected to MongoDB")
+    await mongodb.create_indexes()
+
+    # Cap the threads Starlette runs sync dependencies and background tasks in; the key search
+    # has its own process pool (services/keygen.py) and does not use these threads
+    anyio.to_thread.current_default_thread_limiter().total_tokens = int(os.getenv("THREADPOOL_LIMIT", "16"))
 
     # Initialize Nostr connection
     try:
@@ -42,14 +55,21 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"Error closing Nostr connection: {e}")
 
+    await close_bulk_writers()
+    # Lets a running key search finish, but drops queued ones
+    keygen_pool.shutdown(cancel_futures=True)
     mongodb.close_mongo_connection()
     print("All connections closed")
 
 # Pass the lifespan to FastAPI
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+app.state.limiter = limiter
+app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+
+# Echoing request bodies reads and JSON-parses every POST a second time, so keep it opt-in
+LOG_REQUEST_BODY = os.getenv("LOG_REQUEST_BODY", "").lower() in ("1", "true", "yes")
 
 
-@app.middleware("http")
 async def log_request_body(request: Request, call_next):
     # Only log for POST requests (or check request.url.path for specific endpoints)
     if request.method == "POST":
@@ -72,6 +92,11 @@ async def log_request_body(request: Request, call_next):
 
     response = await call_next(request)
     return response
+
+
+if LOG_REQUEST_BODY:
+    app.middleware("http")(log_request_body)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # For development - restrict in production
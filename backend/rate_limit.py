@@ -0,0 +1,16 @@
+import os
+from dotenv import load_dotenv
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+
+load_dotenv()
+
+# Limits are kept per process by default; set RATE_LIMIT_STORAGE_URI (e.g. redis://host:6379)
+# to share the counters between uvicorn workers
+limiter = Limiter(
+    key_func=get_remote_address,
+    storage_uri=os.getenv("RATE_LIMIT_STORAGE_URI", "memory://"),
+)
+
+# Each challenge request writes a session document, so cap how often a client may ask for one
+CHALLENGE_RATE_LIMIT = os.getenv("CHALLENGE_RATE_LIMIT", "10/minute")
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, HTTPException, Query, Depends, Header
+from fastapi import APIRouter, HTTPException, Query, Depends, Header, Request
 from pydantic import BaseModel
 import base64
 from typing import Optional
 from services.challenge_auth_service import challenge_auth_service
+from rate_limit import limiter, CHALLENGE_RATE_LIMIT
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
@@ -23,7 +24,8 @@ class VerifyResponse(BaseModel):
 
 
 @router.get("/challenge", response_model=ChallengeResponse)
-async def get_challenge(public_key: str = Query(...)):
+@limiter.limit(CHALLENGE_RATE_LIMIT)
+async def get_challenge(request: Request, public_key: str = Query(...)):
     session_id, challenge = await challenge_auth_service.get_challenge(public_key)
     return {"session_id": session_id, "challenge": challenge}
 
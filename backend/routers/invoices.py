@@ -29,7 +29,6 @@ async def get_nwc_info(nwc_string: str):
     try:
         # Call the InvoiceService to get NWC information
         nwc_info = await invoice_service.get_nwc_info(nwc_string)
-        print(type(nwc_info))
         return nwc_info
     except Exception as e:
         # Handle any errors that may occur
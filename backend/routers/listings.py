@@ -1,4 +1,5 @@
 from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+from fastapi.responses import ORJSONResponse
 from typing import List, Dict, Any
 from uuid import UUID, uuid4
 
@@ -33,7 +34,8 @@ async def get_all_listings():
     """
     try:
         results = await listing_service.get_all_listings()
-        return results
+        # Documents are already projected to the response shape; skip re-validating them
+        return ORJSONResponse(content=results)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving listings: {str(e)}")
 
@@ -44,7 +46,7 @@ async def get_listings_by_pubkey(public_key: str):
     """
     try:
         results = await listing_service.get_listings_by_pubkey(public_key)
-        return results
+        return ORJSONResponse(content=results)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving listings: {str(e)}")
 
@@ -55,7 +57,7 @@ async def get_listings_paid_by(public_key: str):
     """
     try:
         results = await listing_service.get_listings_paid_by(public_key)
-        return results
+        return ORJSONResponse(content=results)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving listings: {str(e)}")
 
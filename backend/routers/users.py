@@ -1,6 +1,7 @@
 from typing import Optional, Any, Dict
 
 from fastapi import APIRouter, HTTPException, status, Query, Depends
+from fastapi.responses import ORJSONResponse
 
 from models.user import UserResponse, UserProfileResponse
 from services.user_service import user_service
@@ -20,7 +21,7 @@ router = APIRouter(
 async def get_users():
     try:
         users = await user_service.get_all_users()
-        return users
+        return ORJSONResponse(content=users)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
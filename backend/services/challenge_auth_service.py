@@ -1,30 +1,33 @@
 # services/challenge_auth_service.py
 import uuid
+from functools import lru_cache
+from cachetools import LRUCache
 from datetime import datetime, timedelta
-from bech32 import bech32_decode, convertbits
+from nostr_sdk import PublicKey
 import nacl.signing
 import nacl.exceptions
 import binascii
 from database import mongodb
+from services.bulk_writer import BulkWriter
 
 # Session lifetime in seconds (1 hour = 3600 seconds)
 SESSION_LIFETIME_SECONDS = 3600  # 1 hour
 
+# Challenge requests arrive in bursts; their session inserts are written in batches
+session_writer = BulkWriter("sessions")
+
 
 def parse_public_key(npub: str) -> bytes:
     """
     Decodes a Nostr public key in bech32 format (npub...) into its raw 32-byte value.
     """
+    if not npub.startswith("npub1"):
+        raise ValueError("Invalid public key: expected an npub1... string")
     try:
-        hrp, data = bech32_decode(npub)
-        if data is None:
-            raise ValueError("bech32_decode returned None")
-        raw_pubkey = bytes(convertbits(data, 5, 8, False))
-        if len(raw_pubkey) != 32:
-            raise ValueError(f"Invalid public key length: {len(raw_pubkey)} (expected 32 bytes)")
-        return raw_pubkey
+        # nostr-sdk decodes bech32 natively and checks the key length
+        return bytes.fromhex(PublicKey.parse(npub).to_hex())
     except Exception as e:
-        raise e
+        raise ValueError(f"Invalid public key: {e}") from e
 
 
 def get_public_key_from_seed(raw_seed_hex: str) -> bytes:
@@ -50,11 +53,42 @@ def get_public_key_from_seed(raw_seed_hex: str) -> bytes:
         raise e
 
 
+# The bech32-decoded key never changes for a given npub, so its VerifyKey is built once and reused
+@lru_cache(maxsize=10_000)
+def _verify_key_for_npub(npub: str) -> nacl.signing.VerifyKey:
+    return nacl.signing.VerifyKey(parse_public_key(npub))
+
+
+# TweetNaCl VerifyKeys of users with a raw seed, keyed by npub. The seed is derived from the user's
+# private key and never changes, so a cached key saves the users lookup on every later attempt
+_seed_verify_keys = LRUCache(maxsize=10_000)
+
+
+async def _verify_key_for_user(npub: str) -> nacl.signing.VerifyKey:
+    """
+    The key the frontend signs challenges with: the TweetNaCl key made from the user's raw seed,
+    or the bech32-decoded key for users without one.
+    """
+    verify_key = _seed_verify_keys.get(npub)
+    if verify_key is not None:
+        return verify_key
+
+    user = await mongodb.db.users.find_one({"nostr_public_key": npub}, {"raw_seed": 1, "_id": 0})
+    if not user or "raw_seed" not in user:
+        # Not cached: the user may be created with a seed later
+        return _verify_key_for_npub(npub)
+
+    verify_key = nacl.signing.VerifyKey(get_public_key_from_seed(user["raw_seed"]))
+    _seed_verify_keys[npub] = verify_key
+    return verify_key
+
+
 class ChallengeAuthService:
     async def get_challenge(self, public_key: str) -> (str, str):
         session_id = str(uuid.uuid4())
         challenge = f"auth-challenge:{session_id}"
-        expires_at = datetime.utcnow() + timedelta(seconds=SESSION_LIFETIME_SECONDS)
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=SESSION_LIFETIME_SECONDS)
 
         # Store session in MongoDB
         session_data = {
@@ -63,105 +97,68 @@ class ChallengeAuthService:
             "challenge": challenge,
             "expires_at": expires_at,
             "verified": False,
-            "created_at": datetime.utcnow()
+            "created_at": now
         }
 
-        # Insert into sessions collection
-        await mongodb.db.sessions.insert_one(session_data)
-
-        # Create TTL index if it doesn't exist (only needs to be done once)
-        # This will automatically delete expired sessions
-        await mongodb.db.sessions.create_index("expires_at", expireAfterSeconds=0)
+        # Insert into sessions collection, batched with concurrent challenge requests
+        await session_writer.submit(session_data)
 
         return session_id, challenge
 
+    async def _mark_verified(self, session_id: str):
+        """Update verification status in MongoDB"""
+        await mongodb.db.sessions.update_one(
+            {"session_id": session_id},
+            {"$set": {"verified": True}}
+        )
+
     async def verify_challenge_signature(self, session_id: str, signature: bytes) -> bool:
-        # Get session from MongoDB
-        session_data = await mongodb.db.sessions.find_one({"session_id": session_id})
+        # Get the unexpired session from MongoDB; expired ones are left to the TTL index
+        session_data = await mongodb.db.sessions.find_one(
+            {"session_id": session_id, "expires_at": {"$gt": datetime.utcnow()}},
+            {"public_key": 1, "challenge": 1, "_id": 0}
+        )
 
         if not session_data:
             return False
 
-        if datetime.utcnow() > session_data["expires_at"]:
-            await mongodb.db.sessions.delete_one({"session_id": session_id})
-            return False
-
         stored_pubkey_bech32 = session_data["public_key"]
         challenge_str = session_data["challenge"]
 
         try:
-            # Decode the stored public key using our helper
-            raw_pubkey = parse_public_key(stored_pubkey_bech32)
-
-            # Encode the challenge
-            challenge_bytes = challenge_str.encode()
-
-            verify_key = nacl.signing.VerifyKey(raw_pubkey)
-            # Attempt to verify the signature
-            try:
-                verify_key.verify(challenge_bytes, signature)
-                # Update verification status in MongoDB
-                await mongodb.db.sessions.update_one(
-                    {"session_id": session_id},
-                    {"$set": {"verified": True}}
-                )
-                return True
-            except nacl.exceptions.BadSignatureError:
-                # If verification fails with the bech32-derived key, try using the user's raw seed
-                # This is a fallback to handle TweetNaCl's key derivation on the frontend
-                user = await mongodb.db.users.find_one({"nostr_public_key": stored_pubkey_bech32})
-
-                if user and "raw_seed" in user:
-                    try:
-                        # Generate the public key using TweetNaCl's method
-                        tweetnacl_pubkey = get_public_key_from_seed(user["raw_seed"])
-
-                        # Verify with the TweetNaCl-derived public key
-                        tweetnacl_verify_key = nacl.signing.VerifyKey(tweetnacl_pubkey)
-                        tweetnacl_verify_key.verify(challenge_bytes, signature)
-
-                        # Update verification status in MongoDB
-                        await mongodb.db.sessions.update_one(
-                            {"session_id": session_id},
-                            {"$set": {"verified": True}}
-                        )
-                        return True
-                    except nacl.exceptions.BadSignatureError as bse:
-                        return False
-                    except Exception as e:
-                        return False
-                else:
-                    return False
+            # Only the key the user actually signs with is checked, so a bad signature costs a single
+            # verification, and no users lookup once the key is cached
+            verify_key = await _verify_key_for_user(stored_pubkey_bech32)
+
+            verify_key.verify(challenge_str.encode(), signature)
+            await self._mark_verified(session_id)
+            return True
         except nacl.exceptions.BadSignatureError as bse:
             return False
         except Exception as e:
             return False
 
     async def is_session_valid(self, session_id: str) -> bool:
-        session_data = await mongodb.db.sessions.find_one({"session_id": session_id})
+        # Expired sessions are filtered out by the query and reaped by the TTL index on expires_at
+        session_data = await mongodb.db.sessions.find_one(
+            {"session_id": session_id, "expires_at": {"$gt": datetime.utcnow()}},
+            {"verified": 1, "_id": 0}
+        )
 
         if not session_data:
             return False
 
-        if datetime.utcnow() > session_data["expires_at"]:
-            await mongodb.db.sessions.delete_one({"session_id": session_id})
-            return False
-
         return session_data["verified"]
 
     async def get_public_key_for_session(self, session_id: str) -> str:
-        session_data = await mongodb.db.sessions.find_one({"session_id": session_id})
+        session_data = await mongodb.db.sessions.find_one(
+            {"session_id": session_id, "expires_at": {"$gt": datetime.utcnow()}, "verified": True},
+            {"public_key": 1, "_id": 0}
+        )
 
         if not session_data:
             return None
 
-        if datetime.utcnow() > session_data["expires_at"]:
-            await mongodb.db.sessions.delete_one({"session_id": session_id})
-            return None
-
-        if not session_data["verified"]:
-            return None
-
         return session_data["public_key"]
 
 
@@ -0,0 +1,32 @@
+# Runs inside spawned worker processes, so keep the imports of this module light
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
+from nostr_sdk import Keys
+
+load_dotenv()
+
+# The vanity search is CPU-bound, so the cores are split between the uvicorn workers
+# (uvicorn also reads WEB_CONCURRENCY as its default worker count)
+KEYGEN_WORKERS = int(os.getenv(
+    "KEYGEN_WORKERS",
+    max(1, (os.cpu_count() or 1) // int(os.getenv("WEB_CONCURRENCY", "1")))
+))
+
+# Spawn rather than fork: the parent already runs nostr-sdk's runtime threads, which a fork
+# would copy in an undefined state. Processes are only started on the first registration
+keygen_pool = ProcessPoolExecutor(max_workers=KEYGEN_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+
+def generate_nostr_key_pair(prefix: str) -> (str, str):
+    """
+    Generate a Nostr key pair repeatedly until the public key starts with the given prefix.
+    Returns a tuple of bech32 strings: (private_key, public_key), since key objects
+    cannot be sent back from a worker process.
+    """
+    while True:
+        keys = Keys.generate()
+        bech32_pub = keys.public_key().to_bech32()
+        if bech32_pub.startswith(prefix):
+            return keys.secret_key().to_bech32(), bech32_pub
@@ -1,15 +1,73 @@
+import asyncio
 import hashlib
 import json
 from typing import List, Dict, Any, Optional, cast
 from datetime import datetime
-from uuid import UUID, uuid4
+from uuid import uuid4
 
+from cachetools import TTLCache
 from nostr_sdk import Tag, TagKind
+from pymongo import ReturnDocument
 
-from models.listing import ListingCreate, ListingInDB, ListingUpdate
+from models.listing import ListingCreate, ListingInDB, ListingUpdate, ListingResponse
 from database import mongodb
+from services.bulk_writer import BulkWriter
 from services.nostr_service import nostr_service
 
+# Number of leading zero hex digits required in a listing's proof-of-work hash
+POW_DIFFICULTY = 5
+
+
+def _make_difficulty_check(difficulty: int):
+    """
+    Build a check for a hex-digit difficulty with the zero-byte prefix and the
+    odd-nibble test baked in, so verifying a digest is a single comparison.
+    """
+    zero_bytes = b"\x00" * (difficulty // 2)
+    if difficulty % 2 == 0:
+        def check(digest: bytes) -> bool:
+            return digest.startswith(zero_bytes)
+    else:
+        nibble_index = len(zero_bytes)
+
+        def check(digest: bytes) -> bool:
+            return digest.startswith(zero_bytes) and digest[nibble_index] < 0x10
+    return check
+
+
+_meets_pow_difficulty = _make_difficulty_check(POW_DIFFICULTY)
+
+
+def _proof_of_work_digest(payload: bytes, nonce: bytes) -> bytes:
+    """SHA-256 of the serialized listing followed by the nonce, fed to the hasher without joining them"""
+    hasher = hashlib.sha256(payload)
+    hasher.update(nonce)
+    return hasher.digest()
+
+
+# List endpoints return documents as-is, so only fetch the fields ListingResponse exposes
+_LISTING_PROJECTION = {field: 1 for field in ListingResponse.__fields__ if field != "id"}
+
+# Short-lived cache of GET /listings/, cleared whenever this process writes a listing
+_all_listings_cache = TTLCache(maxsize=1, ttl=15)
+
+# New listings are inserted in batches with other concurrent creations
+listing_writer = BulkWriter("listings")
+
+
+# Values BSON stores as-is; other scalars (UUID, ...) are stored as strings
+_MONGO_NATIVE_TYPES = (str, int, float, bool, datetime, type(None))
+
+
+def _to_mongo_value(value: Any) -> Any:
+    if isinstance(value, _MONGO_NATIVE_TYPES):
+        return value
+    if isinstance(value, dict):
+        return {key: _to_mongo_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_to_mongo_value(item) for item in value]
+    return str(value)
+
 
 class ListingService:
     """Service for handling listing operations with MongoDB and Nostr"""
@@ -19,26 +77,7 @@ class ListingService:
     @staticmethod
     def _serialize_listing(listing_dict: Dict[Any, Any]) -> Dict[Any, Any]:
         """Convert UUID, datetime, and Pydantic objects to strings for MongoDB"""
-        result = {}
-        for key, value in listing_dict.items():
-            if isinstance(value, UUID):
-                result[key] = str(value)
-            elif isinstance(value, datetime):
-                result[key] = value
-            elif isinstance(value, dict):
-                result[key] = ListingService._serialize_listing(value)
-            elif isinstance(value, list):
-                result[key] = [
-                    ListingService._serialize_listing(item) if isinstance(item, dict) else
-                    str(item) if hasattr(item, '__str__') and not isinstance(item, (str, int, float, bool)) else item
-                    for item in value
-                ]
-            elif hasattr(value, '__str__') and not isinstance(value, (str, int, float, bool)):
-                # Convert Pydantic types (like HttpUrl) to strings
-                result[key] = str(value)
-            else:
-                result[key] = value
-        return result
+        return {key: _to_mongo_value(value) for key, value in listing_dict.items()}
 
     @staticmethod
     def _deserialize_listing(db_listing: Dict[Any, Any]) -> Dict[Any, Any]:
@@ -64,7 +103,7 @@ class ListingService:
             Listing data or None if not found
         """
         collection = mongodb.db[self.collection_name]
-        listing = await collection.find_one({"_id": listing_id})
+        listing = await collection.find_one({"_id": listing_id}, _LISTING_PROJECTION)
 
         if not listing:
             return None
@@ -75,11 +114,14 @@ class ListingService:
         """
         Return all listings from MongoDB.
         """
+        listings = _all_listings_cache.get("all")
+        if listings is not None:
+            return listings
+
         collection = mongodb.db[self.collection_name]
-        cursor = collection.find({})
-        listings = []
-        async for listing in cursor:
-            listings.append(self._deserialize_listing(listing))
+        cursor = collection.find({}, _LISTING_PROJECTION)
+        listings = [self._deserialize_listing(listing) for listing in await cursor.to_list(length=None)]
+        _all_listings_cache["all"] = listings
         return listings
 
     async def get_listings_by_pubkey(self, pubkey: str) -> List[Dict[Any, Any]]:
@@ -87,10 +129,8 @@ class ListingService:
         Return all listings that were created by the specified public key.
         """
         collection = mongodb.db[self.collection_name]
-        cursor = collection.find({"pubkey": pubkey})
-        listings = []
-        async for listing in cursor:
-            listings.append(self._deserialize_listing(listing))
+        cursor = collection.find({"pubkey": pubkey}, _LISTING_PROJECTION)
+        listings = [self._deserialize_listing(listing) for listing in await cursor.to_list(length=None)]
         return listings
 
     async def get_listings_paid_by(self, pubkey: str) -> List[Dict[Any, Any]]:
@@ -98,10 +138,8 @@ class ListingService:
         Return all listings from MongoDB where 'paid_by' equals the given public key.
         """
         collection = mongodb.db[self.collection_name]
-        cursor = collection.find({"paid_by": pubkey})
-        listings = []
-        async for listing in cursor:
-            listings.append(self._deserialize_listing(listing))
+        cursor = collection.find({"paid_by": pubkey}, _LISTING_PROJECTION)
+        listings = [self._deserialize_listing(listing) for listing in await cursor.to_list(length=None)]
         return listings
 
     async def create_listing(self, listing_data: ListingCreate) -> ListingInDB:
@@ -109,20 +147,20 @@ class ListingService:
         Create a new listing in MongoDB and publish to Nostr.
         Validates the proof-of-work nonce.
         """
-        listing_dict = listing_data.dict()
+        # The nonce only proves the work; it is neither hashed nor stored with the listing
+        listing_dict = listing_data.dict(exclude={"nonce"})
 
         # Validate Proof-of-Work
-        if "nonce" not in listing_dict:
+        nonce = listing_data.nonce
+        if nonce is None:
             raise Exception("Nonce not provided for proof of work.")
-        nonce = listing_dict["nonce"]
-        is_valid, computed_hash = self.validate_proof_of_work(listing_dict, nonce, difficulty=5)
+        is_valid, computed_hash = self.validate_proof_of_work(listing_dict, nonce, difficulty=POW_DIFFICULTY)
         if not is_valid:
             raise Exception(f"Invalid proof of work. Computed hash: {computed_hash} does not meet difficulty.")
 
         # Populate additional fields.
         listing_dict["id"] = str(uuid4())
-        listing_dict["created_at"] = datetime.utcnow()
-        listing_dict["updated_at"] = datetime.utcnow()
+        listing_dict["created_at"] = listing_dict["updated_at"] = datetime.utcnow()
         listing_dict["status"] = "active"
         listing_dict["image"] = {"url": str(listing_dict["image"])}
 
@@ -130,64 +168,77 @@ class ListingService:
         mongo_listing = self._serialize_listing(listing_dict)
         mongo_listing["_id"] = str(listing_dict["id"])
 
-        # Publish to Nostr
-        try:
-            title = listing_dict.get("title", "Untitled Listing")
-            price = listing_dict.get("price", 0)
-            condition = listing_dict.get("condition", "unknown")
-            content = f"📦 {title}\nPrice: {price}\nCondition: {condition}\n\n{listing_dict.get('description', '')}"
-            tags = [
-                Tag.custom(cast(TagKind, TagKind.TITLE()), [title]),
-                Tag.custom(cast(TagKind, TagKind.AMOUNT()), [str(price)]),
-                Tag.custom(cast(TagKind, TagKind.DESCRIPTION()), [condition]),
-            ]
-            nostr_result = await nostr_service.publish_event(content, tags)
-            mongo_listing["nostr_event_id"] = nostr_result["event_id"]
+        # Nostr event for the listing
+        title = listing_dict.get("title", "Untitled Listing")
+        price = listing_dict.get("price", 0)
+        condition = listing_dict.get("condition", "unknown")
+        content = f"📦 {title}\nPrice: {price}\nCondition: {condition}\n\n{listing_dict.get('description', '')}"
+        tags = [
+            Tag.custom(cast(TagKind, TagKind.TITLE()), [title]),
+            Tag.custom(cast(TagKind, TagKind.AMOUNT()), [str(price)]),
+            Tag.custom(cast(TagKind, TagKind.DESCRIPTION()), [condition]),
+        ]
+
+        # Insert into MongoDB and publish to Nostr concurrently; the event ID is patched in afterwards
+        insert_result, nostr_result = await asyncio.gather(
+            listing_writer.submit(mongo_listing),
+            nostr_service.publish_event(content, tags),
+            return_exceptions=True
+        )
+        if isinstance(insert_result, BaseException):
+            raise insert_result
+
+        # publish_event reports most failures as a "nostr-error-..." event ID instead of raising
+        if isinstance(nostr_result, BaseException):
+            nostr_error = str(nostr_result)
+        elif nostr_result["event_id"].startswith("nostr-error-"):
+            nostr_error = nostr_result["event_id"]
+        else:
+            nostr_error = None
+
+        if nostr_error is not None:
+            # Continue even if Nostr publishing fails; the listing is simply stored without an event ID
+            print(f"Error publishing to Nostr: {nostr_error}")
+        else:
+            collection = mongodb.db[self.collection_name]
+            await collection.update_one(
+                {"_id": mongo_listing["_id"]},
+                {"$set": {"nostr_event_id": nostr_result["event_id"]}}
+            )
             listing_dict["nostr_event_id"] = nostr_result.get("event_id")
-        except Exception as e:
-            print(f"Error publishing to Nostr: {e}")
-            # Continue even if Nostr publishing fails
 
-        collection = mongodb.db[self.collection_name]
-        await collection.insert_one(mongo_listing)
-        return ListingInDB(**listing_dict)
+        _all_listings_cache.clear()
+        # The dict was assembled above from validated input; skip validating it a second time
+        return ListingInDB.construct(**listing_dict)
 
     async def update_listing(self, listing_id: str, listing_update: ListingUpdate) -> Optional[Dict[Any, Any]]:
-        # Get existing listing
         collection = mongodb.db[self.collection_name]
-        existing = await collection.find_one({"_id": listing_id})
+        update_data = self._serialize_listing(listing_update.dict(exclude_unset=True))
+        now = datetime.utcnow()
+        update_data["updated_at"] = now
+
+        # Apply only the changed fields and get the updated listing back in the same round-trip
+        existing = await collection.find_one_and_update(
+            {"_id": listing_id},
+            {"$set": update_data},
+            return_document=ReturnDocument.AFTER
+        )
 
         if not existing:
             return None
 
-        # Deserialize and apply updates
         existing = self._deserialize_listing(existing)
-        update_data = listing_update.dict(exclude_unset=True)
 
-        for key, value in update_data.items():
-            existing[key] = value
-
-        # Update timestamp
-        existing["updated_at"] = datetime.utcnow()
-
-        # Prepare for MongoDB update
-        mongo_listing = self._serialize_listing(existing)
-
-        # Initialize event history if it doesn't exist
-        if "nostr_event_history" not in mongo_listing:
-            mongo_listing["nostr_event_history"] = []
-
-        # Update in Nostr if we have a previous event ID
-        if "nostr_event_id" in existing:
+        # Update in Nostr if we have a previous event ID; listings written before failed publishes
+        # were detected may hold an error string instead, which must not be referenced
+        if "nostr_event_id" in existing and not str(existing["nostr_event_id"]).startswith("nostr-error-"):
             try:
                 # Save current event to history before updating
                 previous_event = {
                     "event_id": existing.get("nostr_event_id", ""),
                     "identifier": existing.get("nostr_identifier", ""),
-                    "timestamp": datetime.utcnow().isoformat()
+                    "timestamp": now.isoformat()
                 }
-                # Add to history
-                mongo_listing["nostr_event_history"].append(previous_event)
 
                 # Format content for Nostr
                 title = existing.get("title", "Untitled Listing")
@@ -209,40 +260,52 @@ class ListingService:
                     tags
                 )
 
-                # Update MongoDB with new Nostr event ID
-                mongo_listing["nostr_event_id"] = nostr_result["event_id"]
-                mongo_listing["nostr_identifier"] = nostr_result["identifier"]
-
-                # Update return object
-                existing["nostr_event_id"] = mongo_listing["nostr_event_id"]
-                existing["nostr_identifier"] = mongo_listing["nostr_identifier"]
-                existing["nostr_event_history"] = mongo_listing["nostr_event_history"]
+                if nostr_result["event_id"].startswith("nostr-error-"):
+                    # publish_update reports failures as an error ID instead of raising; keep the current event
+                    print(f"Error updating in Nostr: {nostr_result['event_id']}")
+                else:
+                    # Update MongoDB with new Nostr event ID and append the previous one to the history
+                    await collection.update_one(
+                        {"_id": listing_id},
+                        {
+                            "$set": {
+                                "nostr_event_id": nostr_result["event_id"],
+                                "nostr_identifier": nostr_result["identifier"]
+                            },
+                            "$push": {"nostr_event_history": previous_event}
+                        }
+                    )
+
+                    # Update return object
+                    existing["nostr_event_id"] = nostr_result["event_id"]
+                    existing["nostr_identifier"] = nostr_result["identifier"]
+                    existing["nostr_event_history"] = existing.get("nostr_event_history", []) + [previous_event]
             except Exception as e:
                 print(f"Error updating in Nostr: {e}")
 
-        # Update in MongoDB
-        await collection.replace_one({"_id": listing_id}, mongo_listing)
+        _all_listings_cache.clear()
 
         return existing
 
-    def validate_proof_of_work(self, listing_data: dict, nonce: int, difficulty: int = 7) -> (bool, str):
+    def validate_proof_of_work(self, listing_data: dict, nonce: int, difficulty: int = POW_DIFFICULTY) -> (bool, str):
         """
         Validates that the SHA-256 hash of the concatenation of the listing data (as a compact JSON)
         and nonce starts with a given number of zeros.
 
+        The check is done on the raw digest bytes rather than on its hex form.
+
         :param listing_data: Dictionary of listing information (exclude nonce)
         :param nonce: The nonce provided by the frontend
-        :param difficulty: Number of leading zeros required in the hash (default=7)
+        :param difficulty: Number of leading zero hex digits required in the hash (default=POW_DIFFICULTY)
         :return: Tuple (is_valid: bool, computed_hash: str)
         """
         # Exclude "nonce" if it exists
         data_to_hash = {k: listing_data[k] for k in listing_data if k != "nonce"}
         # Use a compact JSON representation with sorted keys.
-        base_str = json.dumps(data_to_hash, sort_keys=True, separators=(",", ":"))
-        combined = base_str + str(nonce)
-        computed_hash = hashlib.sha256(combined.encode("utf-8")).hexdigest()
-        required_prefix = "0" * difficulty
-        return computed_hash.startswith(required_prefix), computed_hash
+        payload = json.dumps(data_to_hash, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        digest = _proof_of_work_digest(payload, str(nonce).encode("utf-8"))
+        meets_difficulty = _meets_pow_difficulty if difficulty == POW_DIFFICULTY else _make_difficulty_check(difficulty)
+        return meets_difficulty(digest), digest.hex()
 
 
 # Create a service instance
@@ -1,27 +1,28 @@
-import hashlib
+import asyncio
 import os
 import secrets
-import time
 from typing import Dict, List, Optional
 from dotenv import load_dotenv
-from nostr_sdk import Keys, Client, EventBuilder, NostrSigner, Tag, Kind, KindStandard
-import json
+from nostr_sdk import Keys, Client, EventBuilder, NostrSigner, Tag, Kind, KindStandard, PublicKey
+import orjson
 import websocket
-import bech32
 
 load_dotenv()
 
+# Numeric kind of profile metadata events, resolved once instead of on every publish
+METADATA_KIND_U16 = Kind.from_std(KindStandard.METADATA).as_u16()
+
 
 async def npub_to_hex(npub):
     """
         Convert npub format to hex.
     """
-    hrp, data = bech32.bech32_decode(npub)
-    if hrp != "npub":
+    if not npub.startswith("npub1"):
         raise ValueError("Invalid npub")
-    # Convert 5-bit groups back to 8-bit bytes
-    data_bytes = bech32.convertbits(data, 5, 8, False)
-    return bytes(data_bytes).hex()
+    try:
+        return PublicKey.parse(npub).to_hex()
+    except Exception as e:
+        raise ValueError("Invalid npub") from e
 
 
 class NostrService:
@@ -46,12 +47,8 @@ class NostrService:
 
     def _generate_unique_id(self):
         """Generate a unique ID for events."""
-        timestamp = str(time.time())
-        random_bytes = secrets.token_bytes(16)
-        combined = timestamp.encode() + random_bytes
-        unique_id = hashlib.sha256(combined).hexdigest()[:32]
-
-        return unique_id
+        # 128 random bits are unique on their own; hashing them with the time added nothing
+        return secrets.token_hex(16)
 
     async def connect(self, custom_private_key: str = None):
         """
@@ -72,8 +69,7 @@ class NostrService:
             self.signer = NostrSigner.keys(keys)
             self.client = Client(self.signer)
 
-            for relay in self.relays:
-                await self.client.add_relay(relay)
+            await asyncio.gather(*(self.client.add_relay(relay) for relay in self.relays))
 
             await self.client.connect()
             self.is_connected = True
@@ -116,20 +112,16 @@ class NostrService:
 
         try:
             unique_id = self._generate_unique_id()
-            if tags is None:
-                tags = []
-
-            identifier_tag = Tag.identifier(unique_id)
-            tags.append(identifier_tag)
+            # Build a new list so the caller's tags are left untouched
+            tags = [*(tags or []), Tag.identifier(unique_id)]
 
-            if kind_value == 0 or kind_value == Kind.from_std(KindStandard.METADATA).as_u16():
+            if kind_value == 0 or kind_value == METADATA_KIND_U16:
                 builder = EventBuilder.metadata(content) # not used in final release
             else:
                 builder = EventBuilder.text_note(content)
             if kind_value is not None:
                 builder = builder.kind(Kind(kind_value))
-            for tag in tags:
-                builder = builder.tags([tag])
+            builder = builder.tags(tags)
             event = await builder.sign(self.signer)
             await self.client.send_event(event)
             event_id = event.id().to_hex()
@@ -163,23 +155,14 @@ class NostrService:
             # Generate a unique identifier
             unique_id = self._generate_unique_id()
 
-            # Initialize tags list if none provided
-            if tags is None:
-                tags = []
-
-            # Add identifier tag
-            identifier_tag = Tag.identifier(unique_id)
-            tags.append(identifier_tag)
-
-            # Add reference to previous event
-            tags.append(Tag.parse(["e", previous_event_id]))
+            # Add the identifier tag and a reference to the previous event to a copy of the caller's tags
+            tags = [*(tags or []), Tag.identifier(unique_id), Tag.parse(["e", previous_event_id])]
 
             # Create the event builder
             builder = EventBuilder.text_note(content)
 
-            # Add all tags - one at a time to avoid issues
-            for tag in tags:
-                builder = builder.tags([tag])
+            # Add all tags in a single call
+            builder = builder.tags(tags)
 
             # Sign and send the event
             event = await builder.sign(self.signer)
@@ -213,11 +196,11 @@ class NostrService:
         ws = websocket.create_connection("wss://relay.primal.net/")
         pubkey_hex = await npub_to_hex(pubkey)
         req = ["REQ", "find-ln", {"kinds": [0], "authors": [pubkey_hex]}]
-        ws.send(json.dumps(req))
+        ws.send(orjson.dumps(req))
         while True:
-            response = json.loads(ws.recv())
+            response = orjson.loads(ws.recv())
             if response[0] == "EVENT" and response[2]["kind"] == 0:
-                metadata = json.loads(response[2]["content"])
+                metadata = orjson.loads(response[2]["content"])
                 ws.close()
                 return metadata
             if response[0] == "EOSE":
@@ -1,29 +1,44 @@
 import time
 from typing import Dict, Any, Optional
 from uuid import UUID
-import json
+from json.encoder import encode_basestring_ascii
 from models.pop import ProofOfPurchase
 from database import mongodb
-from ecdsa import SigningKey, VerifyingKey, BadSignatureError
-from ecdsa.curves import SECP256k1
-import hashlib
+from secp256k1 import PrivateKey, PublicKey
 import base64
 
-def create_signature(private_key: str, message: str) -> str:
-    sk = SigningKey.from_string(bytes.fromhex(private_key), curve=SECP256k1)
-    message_hash = hashlib.sha256(message.encode('utf-8')).digest()
-    signature = sk.sign(message_hash)
-    return base64.b64encode(signature).decode('utf-8')
 
+def _canonical_pop_bytes(transaction_id: str, listing_id: str, buyer_pubkey: str, seller_pubkey: str) -> bytes:
+    """
+    The signed form of a proof of purchase: exactly what json.dumps(..., sort_keys=True) produces for
+    these four fields, built directly in their sorted order and encoded once for signing and verifying.
+    """
+    return (
+        '{"buyer_pubkey": ' + encode_basestring_ascii(buyer_pubkey)
+        + ', "listing_id": ' + encode_basestring_ascii(listing_id)
+        + ', "seller_pubkey": ' + encode_basestring_ascii(seller_pubkey)
+        + ', "transaction_id": ' + encode_basestring_ascii(transaction_id) + '}'
+    ).encode('ascii')
 
-def verify_signature(public_key: str, signature: str, message: str) -> bool:
-    vk = VerifyingKey.from_string(bytes.fromhex(public_key), curve=SECP256k1)
-    message_hash = hashlib.sha256(message.encode('utf-8')).digest()
+
+def create_signature(private_key: str, message: bytes) -> str:
+    sk = PrivateKey(bytes.fromhex(private_key), raw=True)
+    # libsecp256k1 hashes the message with SHA-256 before signing
+    signature = sk.ecdsa_sign(message)
+    return base64.b64encode(sk.ecdsa_serialize_compact(signature)).decode('utf-8')
+
+
+def verify_signature(public_key: str, signature: str, message: bytes) -> bool:
+    pubkey_bytes = bytes.fromhex(public_key)
+    if len(pubkey_bytes) == 64:
+        # Bare x||y coordinates; libsecp256k1 expects the uncompressed 0x04 prefix
+        pubkey_bytes = b"\x04" + pubkey_bytes
+    vk = PublicKey(pubkey_bytes, raw=True)
     try:
-        vk.verify(base64.b64decode(signature), message_hash)
-        return True
-    except BadSignatureError:
+        raw_signature = vk.ecdsa_deserialize_compact(base64.b64decode(signature))
+    except Exception:
         return False
+    return vk.ecdsa_verify(message, raw_signature)
 
 class PoPService:
     """Proof of purchase"""
@@ -36,27 +51,23 @@ class PoPService:
         seller_private_key: str  # todo: handle it
     ) -> ProofOfPurchase:
 
-        message = {
+        message = _canonical_pop_bytes(transaction_id, listing_id, buyer_pubkey, seller_pubkey)
+        
+        # todo: damn it wtf
+        seller_signature = create_signature(seller_private_key, message)
+        
+        # The fields are all plain strings; store them and build the model without a validation pass
+        pop_record = {
             "transaction_id": transaction_id,
             "listing_id": listing_id,
             "buyer_pubkey": buyer_pubkey,
             "seller_pubkey": seller_pubkey,
+            "seller_signature": seller_signature,
         }
-        message_str = json.dumps(message, sort_keys=True)
-        
-        # todo: damn it wtf
-        seller_signature = create_signature(seller_private_key, message_str)
-        
-        pop = ProofOfPurchase(
-            transaction_id=transaction_id,
-            listing_id=listing_id,
-            buyer_pubkey=buyer_pubkey,
-            seller_pubkey=seller_pubkey,
-            seller_signature=seller_signature,
-        )
-        
+        pop = ProofOfPurchase.construct(**pop_record)
+
         try:
-            await mongodb.proofs_of_purchase.insert_one(pop.dict())
+            await mongodb.db.proofs_of_purchase.insert_one(pop_record)
         except Exception as e:
             raise ValueError(f"error storing PoP: {e}")
 
@@ -78,15 +89,8 @@ class PoPService:
         return ProofOfPurchase(**pop_data)
     
     async def verify_proof_of_purchase(self, pop: ProofOfPurchase) -> bool:
-        message = {
-            "transaction_id": pop.transaction_id,
-            "listing_id": pop.listing_id,
-            "buyer_pubkey": pop.buyer_pubkey,
-            "seller_pubkey": pop.seller_pubkey,
-        }
-        
-        message_str = json.dumps(message, sort_keys=True)
-        return verify_signature(pop.seller_pubkey, pop.seller_signature, message_str)
+        message = _canonical_pop_bytes(pop.transaction_id, pop.listing_id, pop.buyer_pubkey, pop.seller_pubkey)
+        return verify_signature(pop.seller_pubkey, pop.seller_signature, message)
 
 
 proof_of_purchase_service = PoPService()
\ No newline at end of file
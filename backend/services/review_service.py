@@ -1,4 +1,5 @@
 from typing import Dict, Any, List, Optional
+from pymongo.errors import DuplicateKeyError
 from models.review import ReviewCreate, ReviewResponse
 from services.pop_service import proof_of_purchase_service
 from database import mongodb
@@ -18,14 +19,22 @@ class ReviewService:
         }
         
         collection = mongodb.db["reviews"]
-        result = await collection.find_one({"transaction_id": review_data.transaction_id})
+        # The unique index on transaction_id is skipped at startup on databases that already hold
+        # duplicates, so check first rather than rely on the index alone
+        result = await collection.find_one({"transaction_id": review_data.transaction_id}, {"_id": 1})
         if result:
             raise ValueError("Review already exists for this transaction")
-        
-        await collection.insert_one(review)
 
-        
-        return ReviewResponse(**review)
+        # Every field was just built here; build the model before insert_one adds _id to the dict
+        response = ReviewResponse.construct(**review)
+
+        # Where the index exists, it also rejects a concurrent second review that passed the check
+        try:
+            await collection.insert_one(review)
+        except DuplicateKeyError:
+            raise ValueError("Review already exists for this transaction")
+
+        return response
     
     async def get_reviews_for_seller(self, seller_pubkey: str) -> List[ReviewResponse]:
         collection = mongodb.db["reviews"]
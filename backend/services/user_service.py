@@ -1,33 +1,35 @@
+import asyncio
 from uuid import uuid4
 from datetime import datetime
-from nostr_sdk import Keys
+from cachetools import TTLCache
+from nostr_sdk import Keys, SecretKey
+from pymongo import ReturnDocument
 from database import mongodb
-from bech32 import bech32_decode, convertbits
+from services.bulk_writer import BulkWriter
+from services.keygen import keygen_pool, generate_nostr_key_pair
 from services.nostr_service import nostr_service
 
+# Short-lived cache of GET /users/, cleared whenever this process creates a user
+_all_users_cache = TTLCache(maxsize=1, ttl=30)
+
+# Registrations are inserted in batches with other concurrent registrations
+user_writer = BulkWriter("users")
+
+# Fields GET /users/ exposes; keeps raw_seed and the rest of the document in the database
+_USER_LIST_PROJECTION = {"nostr_public_key": 1, "created_at": 1, "username": 1, "display_name": 1, "about": 1}
+
 class UserService:
     collection_name = "users"
 
-    def generate_nostr_key_pair(self, prefix: str):
-        """
-        Generate a Nostr key pair repeatedly until the public key starts with the given prefix.
-        Returns a tuple: (private_key, public_key).
-        """
-        while True:
-            keys = Keys.generate()
-            private_key = keys.secret_key()
-            public_key = keys.public_key()
-            bech32_pub = public_key.to_bech32()
-            if bech32_pub.startswith(prefix):
-                return private_key, public_key
-
     def derive_raw_seed_from_private_key(self, private_key: str) -> str:
         """Extract raw seed bytes from a private key and return as hex string."""
-        hrp, data = bech32_decode(private_key)
-        if not data:
+        # SecretKey.parse also accepts hex keys; only bech32 nsec keys are valid here
+        if not private_key.startswith("nsec1"):
             raise ValueError("Invalid private key format")
-        raw_seed_bytes = bytes(convertbits(data, 5, 8, False))
-        return raw_seed_bytes.hex()
+        try:
+            return SecretKey.parse(private_key).to_hex()
+        except Exception as e:
+            raise ValueError("Invalid private key format") from e
 
     async def register_user(self) -> dict:
         """
@@ -37,9 +39,11 @@ class UserService:
         and empty profile fields.
         """
         prefix = "npub1mrkt"
-        private_key, public_key = self.generate_nostr_key_pair(prefix)
-        private_key_bech32 = private_key.to_bech32()
-        public_key_bech32 = public_key.to_bech32()
+        # The vanity search is pure CPU work; run it in a worker process so it neither stalls
+        # the event loop nor competes with other registrations for the GIL
+        private_key_bech32, public_key_bech32 = await asyncio.get_running_loop().run_in_executor(
+            keygen_pool, generate_nostr_key_pair, prefix
+        )
 
         user_id = uuid4()
         created_at = datetime.utcnow()
@@ -58,8 +62,8 @@ class UserService:
         }
         user_record["_id"] = str(user_id)
 
-        collection = mongodb.db[self.collection_name]
-        await collection.insert_one(user_record)
+        await user_writer.submit(user_record)
+        _all_users_cache.clear()
 
         response = {
             "id": str(user_id),
@@ -95,33 +99,31 @@ class UserService:
         # Get the raw seed
         raw_seed = self.derive_raw_seed_from_private_key(private_key)
 
+        # Find the user or create it with empty profile fields in a single round-trip.
+        # raw_seed is derived from the key itself, so setting it on every login is a no-op
+        # for users that already have it.
+        user_id = str(uuid4())
         collection = mongodb.db[self.collection_name]
-        user = await collection.find_one({"nostr_public_key": derived_public_key})
-
-        if user:
-            # Update raw_seed if it is not present
-            if not user.get("raw_seed"):
-                await collection.update_one(
-                    {"_id": user["_id"]},
-                    {"$set": {"raw_seed": raw_seed}}
-                )
-        else:
-            # Create a new user with empty profile fields
-            user_id = uuid4()
-            created_at = datetime.utcnow()
-            user_record = {
-                "id": str(user_id),
-                "nostr_public_key": derived_public_key,
-                "created_at": created_at,
-                "raw_seed": raw_seed,
-                "username": "",
-                "display_name": "",
-                "about": "",
-                "picture": ""
-            }
-            user_record["_id"] = str(user_id)
-            await collection.insert_one(user_record)
-            user = user_record
+        user = await collection.find_one_and_update(
+            {"nostr_public_key": derived_public_key},
+            {
+                "$set": {"raw_seed": raw_seed},
+                "$setOnInsert": {
+                    "_id": user_id,
+                    "id": user_id,
+                    "created_at": datetime.utcnow(),
+                    "username": "",
+                    "display_name": "",
+                    "about": "",
+                    "picture": ""
+                }
+            },
+            projection={"raw_seed": 0},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        if user["_id"] == user_id:
+            _all_users_cache.clear()
 
         return {
             "id": user["id"],
@@ -143,11 +145,14 @@ class UserService:
     
     async def get_all_users(self) -> list:
         """Returns all users but only their pubkeys and ids"""
+        users = _all_users_cache.get("all")
+        if users is not None:
+            return users
+
         collection = mongodb.db[self.collection_name]
-        cursor = collection.find({})
-        users = []
-        async for user in cursor:
-            user_data = {
+        cursor = collection.find({}, _USER_LIST_PROJECTION)
+        users = [
+            {
                 "id": str(user["_id"]),
                 "nostr_public_key": user.get("nostr_public_key"),
                 "created_at": user.get("created_at"),
@@ -155,8 +160,9 @@ class UserService:
                 "display_name": user.get("display_name", ""),
                 "about": user.get("about", "")
             }
-
-            users.append(user_data)
+            for user in await cursor.to_list(length=None)
+        ]
+        _all_users_cache["all"] = users
         return users
 
 user_service = UserService()
\ No newline at end of file